@@ -1,6 +1,8 @@
 import math
 
 import matplotlib.pyplot as plt
+import numba
+import numpy as np
 import sys
 import pathlib
 
@@ -15,6 +17,73 @@ from common.gif_creator import *
 from common.common_util import *
 
 show_animation = True
+# Save one animation frame per this many expanded cells; rasterizing a
+# frame per cell dominates the demo's wall time.
+animation_frame_stride = 5
+
+
+@numba.njit(cache=True)
+def _dfs_core(
+    obmap,
+    motion_dx,
+    motion_dy,
+    start_id,
+    goal_id,
+    xwidth,
+    ywidth,
+    parent_idx,
+    visit_order,
+):
+    """
+    Run the whole DFS expansion loop as compiled code.
+
+    Fills parent_idx with the parent grid id of every reached cell and
+    visit_order with the expansion sequence (for the animation replay).
+    Returns (found, number of expanded cells).
+    """
+    visited = np.zeros(xwidth * ywidth, dtype=np.bool_)
+    stack = np.empty(xwidth * ywidth, dtype=np.int32)
+    top = 0
+    stack[top] = start_id
+    top += 1
+    visited[start_id] = True
+
+    n_visit = 0
+    found = False
+    while top > 0:
+        top -= 1
+        c_id = stack[top]
+        c_x = c_id % xwidth
+        c_y = c_id // xwidth
+
+        visit_order[n_visit] = c_id
+        n_visit += 1
+
+        if c_id == goal_id:
+            found = True
+            break
+
+        # expand_grid search grid based on motion model
+        for i in range(motion_dx.shape[0]):
+            n_x = c_x + motion_dx[i]
+            n_y = c_y + motion_dy[i]
+
+            # If the node is not safe, do nothing. The coordinates are
+            # already grid indices, so the bounds check stays in index
+            # space with a single obstacle fetch.
+            if not (
+                0 <= n_x < xwidth and 0 <= n_y < ywidth and not obmap[n_x, n_y]
+            ):
+                continue
+
+            n_id = n_y * xwidth + n_x
+            if not visited[n_id]:
+                stack[top] = n_id
+                top += 1
+                visited[n_id] = True
+                parent_idx[n_id] = c_id
+
+    return found, n_visit
 
 
 class DepthFirstSearchPlanner:
@@ -34,29 +103,13 @@ class DepthFirstSearchPlanner:
         self.calc_obstacle_map(ox, oy)
         self.motion = self.get_motion_model()
 
-    class Node:
-        def __init__(self, x, y, cost, parent_index, parent):
-            self.x = x  # index of grid
-            self.y = y  # index of grid
-            self.cost = cost
-            self.parent_index = parent_index
-            self.parent = parent
-
-        def __str__(self):
-            return (
-                str(self.x)
-                + ","
-                + str(self.y)
-                + ","
-                + str(self.cost)
-                + ","
-                + str(self.parent_index)
-            )
-
     def planning(self, sx, sy, gx, gy):
         """
         Depth First search
 
+        Nodes are plain grid ids into preallocated parent/visited arrays
+        instead of per-cell python objects.
+
         input:
             s_x: start x position [m]
             s_y: start y position [m]
@@ -68,85 +121,64 @@ class DepthFirstSearchPlanner:
             ry: y position list of the final path
         """
 
-        nstart = self.Node(
-            self.calc_xyindex(sx, self.minx),
-            self.calc_xyindex(sy, self.miny),
-            0.0,
-            -1,
-            None,
+        sx_i = self.calc_xyindex(sx, self.minx)
+        sy_i = self.calc_xyindex(sy, self.miny)
+        gx_i = self.calc_xyindex(gx, self.minx)
+        gy_i = self.calc_xyindex(gy, self.miny)
+
+        self.parent_idx = np.full(self.xwidth * self.ywidth, -1, dtype=np.int32)
+        visit_order = np.empty(self.xwidth * self.ywidth, dtype=np.int32)
+        motion_dx = np.array([m[0] for m in self.motion], dtype=np.int32)
+        motion_dy = np.array([m[1] for m in self.motion], dtype=np.int32)
+
+        goal_id = self.calc_grid_index(gx_i, gy_i)
+
+        found, n_visit = _dfs_core(
+            self.obmap,
+            motion_dx,
+            motion_dy,
+            self.calc_grid_index(sx_i, sy_i),
+            goal_id,
+            self.xwidth,
+            self.ywidth,
+            self.parent_idx,
+            visit_order,
         )
-        ngoal = self.Node(
-            self.calc_xyindex(gx, self.minx),
-            self.calc_xyindex(gy, self.miny),
-            0.0,
-            -1,
-            None,
-        )
-
-        open_set, closed_set = dict(), dict()
-        open_set[self.calc_grid_index(nstart)] = nstart
-        while True:
-            if len(open_set) == 0:
-                print("Open set is empty..")
-                break
 
-            current = open_set.pop(list(open_set.keys())[-1])
-            c_id = self.calc_grid_index(current)
-
-            # show graph
-            if show_animation:  # pragma: no cover
+        if found:
+            print("Find goal")
+        else:
+            print("Open set is empty..")
+
+        # show graph: replay the expansion order recorded by the core
+        if show_animation:  # pragma: no cover
+            # for stopping simulation with the esc key.
+            plt.gcf().canvas.mpl_connect(
+                "key_release_event",
+                lambda event: [exit(0) if event.key == "escape" else None],
+            )
+            for k in range(n_visit):
+                c_id = visit_order[k]
                 plt.plot(
-                    self.calc_grid_position(current.x, self.minx),
-                    self.calc_grid_position(current.y, self.miny),
+                    self.calc_grid_position(c_id % self.xwidth, self.minx),
+                    self.calc_grid_position(c_id // self.xwidth, self.miny),
                     "xc",
                 )
-                # for stopping simulation with the esc key.
-                plt.gcf().canvas.mpl_connect(
-                    "key_release_event",
-                    lambda event: [exit(0) if event.key == "escape" else None],
-                )
-                plt.savefig(gif_creator.get_image_path())
-                plt.pause(0.01)
-
-            if current.x == ngoal.x and current.y == ngoal.y:
-                print("Find goal")
-                ngoal.parent_index = current.parent_index
-                ngoal.cost = current.cost
-                break
-
-            # expand_grid search grid based on motion model
-            for i, _ in enumerate(self.motion):
-                node = self.Node(
-                    current.x + self.motion[i][0],
-                    current.y + self.motion[i][1],
-                    current.cost + self.motion[i][2],
-                    c_id,
-                    None,
-                )
-                n_id = self.calc_grid_index(node)
-
-                # If the node is not safe, do nothing
-                if not self.verify_node(node):
-                    continue
+                if (k + 1) % animation_frame_stride == 0 or k == n_visit - 1:
+                    plt.savefig(gif_creator.get_image_path())
+                    plt.pause(0.01)
 
-                if n_id not in closed_set:
-                    open_set[n_id] = node
-                    closed_set[n_id] = node
-                    node.parent = current
-
-        rx, ry = self.calc_final_path(ngoal, closed_set)
+        rx, ry = self.calc_final_path(goal_id)
         return rx, ry
 
-    def calc_final_path(self, ngoal, closedset):
-        # generate final course
-        rx, ry = [self.calc_grid_position(ngoal.x, self.minx)], [
-            self.calc_grid_position(ngoal.y, self.miny)
-        ]
-        n = closedset[ngoal.parent_index]
-        while n is not None:
-            rx.append(self.calc_grid_position(n.x, self.minx))
-            ry.append(self.calc_grid_position(n.y, self.miny))
-            n = n.parent
+    def calc_final_path(self, goal_id):
+        # generate final course by walking the parent indices back to the start
+        rx, ry = [], []
+        n_id = goal_id
+        while n_id != -1:
+            rx.append(self.calc_grid_position(n_id % self.xwidth, self.minx))
+            ry.append(self.calc_grid_position(n_id // self.xwidth, self.miny))
+            n_id = self.parent_idx[n_id]
 
         return rx, ry
 
@@ -164,27 +196,8 @@ class DepthFirstSearchPlanner:
     def calc_xyindex(self, position, min_pos):
         return round((position - min_pos) / self.reso)
 
-    def calc_grid_index(self, node):
-        return (node.y - self.miny) * self.xwidth + (node.x - self.minx)
-
-    def verify_node(self, node):
-        px = self.calc_grid_position(node.x, self.minx)
-        py = self.calc_grid_position(node.y, self.miny)
-
-        if px < self.minx:
-            return False
-        elif py < self.miny:
-            return False
-        elif px >= self.maxx:
-            return False
-        elif py >= self.maxy:
-            return False
-
-        # collision check
-        if self.obmap[node.x][node.y]:
-            return False
-
-        return True
+    def calc_grid_index(self, ix, iy):
+        return iy * self.xwidth + ix
 
     def calc_obstacle_map(self, ox, oy):
         self.minx = round(min(ox))
@@ -194,17 +207,17 @@ class DepthFirstSearchPlanner:
         self.xwidth = round((self.maxx - self.minx) / self.reso)
         self.ywidth = round((self.maxy - self.miny) / self.reso)
 
-        # obstacle map generation
-        self.obmap = [[False for _ in range(self.ywidth)] for _ in range(self.xwidth)]
-        for ix in range(self.xwidth):
-            x = self.calc_grid_position(ix, self.minx)
-            for iy in range(self.ywidth):
-                y = self.calc_grid_position(iy, self.miny)
-                for iox, ioy in zip(ox, oy):
-                    d = math.hypot(iox - x, ioy - y)
-                    if d <= self.rr:
-                        self.obmap[ix][iy] = True
-                        continue
+        # obstacle map generation: broadcast the grid against all obstacle
+        # points at once instead of a python loop per (cell, obstacle) pair.
+        grid_x = np.arange(self.xwidth) * self.reso + self.minx
+        grid_y = np.arange(self.ywidth) * self.reso + self.miny
+        ox = np.asarray(ox, dtype=np.float64)
+        oy = np.asarray(oy, dtype=np.float64)
+        dx = grid_x[:, None, None] - ox[None, None, :]
+        dy = grid_y[None, :, None] - oy[None, None, :]
+        # Compare squared distances; the sqrt inside hypot adds nothing
+        # to a monotonic threshold test.
+        self.obmap = (dx * dx + dy * dy <= self.rr * self.rr).any(axis=2)
 
     @staticmethod
     def get_motion_model():
@@ -224,48 +237,33 @@ class DepthFirstSearchPlanner:
 
 
 def construct_env_info():
-    border_x = []
-    border_y = []
-    ox = []
-    oy = []
-
     # map border.
-    for i in range(-10, 60):
-        border_x.append(i)
-        border_y.append(-10.0)
-    for i in range(-10, 60):
-        border_x.append(60.0)
-        border_y.append(i)
-    for i in range(-10, 61):
-        border_x.append(i)
-        border_y.append(60.0)
-    for i in range(-10, 61):
-        border_x.append(-10.0)
-        border_y.append(i)
-
-    # Obstacle 1.
-    for i in range(40, 55, 1):
-        for j in range(5, 15, 1):
-            ox.append(i)
-            oy.append(j)
-
-    # Obstacle 2.
-    for i in range(40):
-        for j in range(20, 25, 1):
-            ox.append(j)
-            oy.append(i)
-
-    # Obstacle 3.
-    for i in range(30):
-        for j in range(40, 45, 1):
-            ox.append(j)
-            oy.append(58.0 - i)
-
-    # Obstacle 4.
-    for i in range(0, 20, 1):
-        for j in range(35, 40, 1):
-            ox.append(i)
-            oy.append(j)
+    border_x = np.concatenate(
+        [
+            np.arange(-10, 60, dtype=np.float64),
+            np.full(70, 60.0),
+            np.arange(-10, 61, dtype=np.float64),
+            np.full(71, -10.0),
+        ]
+    )
+    border_y = np.concatenate(
+        [
+            np.full(70, -10.0),
+            np.arange(-10, 60, dtype=np.float64),
+            np.full(71, 60.0),
+            np.arange(-10, 61, dtype=np.float64),
+        ]
+    )
+
+    # Obstacles 1-4 as rectangular (x range, y range) blocks.
+    obstacle_blocks = [
+        np.meshgrid(np.arange(40, 55, dtype=np.float64), np.arange(5, 15)),
+        np.meshgrid(np.arange(20, 25, dtype=np.float64), np.arange(0, 40)),
+        np.meshgrid(np.arange(40, 45, dtype=np.float64), 58.0 - np.arange(30)),
+        np.meshgrid(np.arange(0, 20, dtype=np.float64), np.arange(35, 40)),
+    ]
+    ox = np.concatenate([block_x.ravel() for block_x, _ in obstacle_blocks])
+    oy = np.concatenate([block_y.ravel() for _, block_y in obstacle_blocks])
 
     return border_x, border_y, ox, oy
 
@@ -292,8 +290,8 @@ def main():
         plt.grid(True)
         plt.axis("equal")
 
-    ox.extend(border_x)
-    oy.extend(border_y)
+    ox = np.concatenate([ox, border_x])
+    oy = np.concatenate([oy, border_y])
     dfs = DepthFirstSearchPlanner(ox, oy, grid_size, robot_radius)
     rx, ry = dfs.planning(start_x, start_y, goal_x, goal_y)
 